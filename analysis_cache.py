@@ -0,0 +1,388 @@
+"""
+Persistent result cache for the notebook analysis stages.
+
+Each stage is keyed on its source code, the source of the helper functions
+and the plain data globals it references (followed recursively), its
+arguments (NumPy arrays and DataFrames are hashed by content), any extra
+state returned by its depends= callables, and the contents of its input
+files. A change anywhere upstream therefore changes every downstream key.
+The installed NumPy and pandas versions are part of every key as well.
+
+Limitation: data globals are hashed by value, so a global the stage itself
+mutates (say, a list it appends to) changes the key on every call and that
+stage never hits. Keep such state out of module globals or pass it in as
+an argument that is not part of the result.
+
+Stages that write files (outputs=) record the SHA-256 of each output; a
+cached result is only reused while the files on disk still match it.
+Results are stored as .npz archives and the cache directory is kept under a
+size limit by evicting the least recently used entries.
+
+Usage:
+    cache = ResultCache(".analysis_cache", max_bytes=512 * 1024 ** 2)
+
+    @cache.stage(files=("filename",))
+    def read_data(filename):
+        return pd.read_excel(filename)
+
+    @cache.stage(outputs=("path",), depends=(lambda: plt.rcParams,))
+    def render(x, y, path):
+        ...  # re-run when x, y, the code, rcParams change or path is missing
+"""
+import dis
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+import types
+
+import numpy as np
+
+try:
+    import pandas as pd
+except ImportError:  # pandas is only needed to hash DataFrame arguments
+    pd = None
+
+INDEX_FILE = "index.json"
+
+# Globals of these types are hashed by value when a stage references them
+DATA_TYPES = (bool, int, float, complex, str, bytes, tuple, list, dict, np.ndarray, np.generic)
+if pd is not None:
+    DATA_TYPES += (pd.DataFrame, pd.Series)
+
+# Source text per code object, so repeated calls don't re-read the source
+_sources = {}
+
+
+def _update_digest(h, obj):
+    """Feed a stable representation of obj into the hash h"""
+    if isinstance(obj, np.ndarray):
+        h.update(b"ndarray")
+        h.update(str(obj.dtype).encode())
+        h.update(str(obj.shape).encode())
+        if obj.dtype == object:
+            h.update(repr(obj.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(type(obj).__name__.encode())
+        h.update(repr(obj.dtypes if isinstance(obj, pd.DataFrame) else obj.dtype).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _update_digest(h, item)
+    elif isinstance(obj, dict):
+        h.update(f"dict{len(obj)}".encode())
+        for key in sorted(obj, key=repr):
+            _update_digest(h, key)
+            _update_digest(h, obj[key])
+    else:
+        h.update(repr(obj).encode())
+
+
+def _source(func):
+    """Source of a function, falling back to its bytecode"""
+    code = func.__code__
+    if code not in _sources:
+        try:
+            _sources[code] = inspect.getsource(func)
+        except (OSError, TypeError):
+            _sources[code] = code.co_code.hex() + repr(code.co_consts)
+    return _sources[code]
+
+
+def _code_names(code):
+    """Global names loaded by a code object and the code objects nested in it"""
+    # co_names also holds attribute names (plt.plot, df.T), so look at the
+    # instructions that actually load a global
+    names = {ins.argval for ins in dis.get_instructions(code)
+             if ins.opname in ("LOAD_GLOBAL", "LOAD_NAME")}
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _code_names(const)
+    return names
+
+
+def _update_code_digest(h, func, seen):
+    """
+    Hash a function's source together with what it depends on.
+
+    Helper functions from the same module, found through its global names
+    and closure, are followed recursively; plain data globals are hashed by
+    value. Library functions and modules are not followed.
+    """
+    func = inspect.unwrap(func)
+    if func in seen:
+        return
+    seen.add(func)
+    h.update(_source(func).encode())
+
+    code = func.__code__
+    refs = [(name, func.__globals__[name]) for name in sorted(_code_names(code))
+            if name in func.__globals__]
+    for name, cell in zip(code.co_freevars, func.__closure__ or ()):
+        try:
+            refs.append((name, cell.cell_contents))
+        except ValueError:  # closure variable not bound yet
+            pass
+
+    for name, value in refs:
+        if isinstance(value, types.FunctionType):
+            if inspect.unwrap(value).__module__ == func.__module__:
+                h.update(name.encode())
+                _update_code_digest(h, value, seen)
+        elif isinstance(value, DATA_TYPES):
+            h.update(name.encode())
+            _update_digest(h, value)
+
+
+class ResultCache:
+    """On-disk cache of stage results with size-bounded LRU eviction"""
+
+    def __init__(self, directory=".analysis_cache", max_bytes=512 * 1024 ** 2, verbose=True):
+        """
+        Parameters:
+            directory (str): Folder holding the cached .npz files and the index.
+            max_bytes (int): Upper bound on the total size of cached results.
+            verbose (bool): Print a line whenever a stage is skipped or run.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.verbose = verbose
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, INDEX_FILE)
+        self._index = self._load_index()
+        # Content hashes of input files, reused while size and mtime are unchanged
+        self._file_hashes = {}
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp = self._index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp, self._index_path)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def file_hash(self, path, fresh=False):
+        """
+        SHA-256 of a file's contents (raises FileNotFoundError if missing).
+
+        Unless fresh is set, the hash is reused while size and mtime match.
+        """
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+        cached = self._file_hashes.get(path)
+        if not fresh and cached and cached[0] == stamp:
+            return cached[1]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self._file_hashes[path] = (stamp, digest)
+        return digest
+
+    def make_key(self, name, code, args, files=()):
+        """Build the cache key for a stage call"""
+        h = hashlib.sha256()
+        h.update(name.encode())
+        h.update(code.encode())
+        # Results pickled by one version may not load or behave the same in another
+        h.update(np.__version__.encode())
+        if pd is not None:
+            h.update(pd.__version__.encode())
+        _update_digest(h, args)
+        for path in files:
+            h.update(os.path.abspath(path).encode())
+            h.update(self.file_hash(path).encode())
+        return h.hexdigest()
+
+    def _outputs_match(self, entry, outputs):
+        """True if every output file exists and has the hash recorded with the entry"""
+        recorded = entry.get("outputs", {})
+        for path in outputs:
+            path = os.path.abspath(path)
+            try:
+                # Outputs are rewritten in place, often within the same mtime tick
+                if recorded.get(path) != self.file_hash(path, fresh=True):
+                    return False
+            except FileNotFoundError:
+                return False
+        return True
+
+    def get(self, key, outputs=()):
+        """
+        Return (True, result) on a hit, (False, None) on a miss.
+
+        Output files must still hold what the stage wrote for this key.
+        """
+        path = self._path(key)
+        entry = self._index.get(key)
+        if entry is None or not os.path.exists(path):
+            return False, None
+        if not self._outputs_match(entry, outputs):
+            return False, None
+        try:
+            with np.load(path) as data:
+                result = _decode(data)
+        except Exception:
+            # Corrupt archive, or a pickle that no longer loads after an
+            # upgrade: treat it as a miss and let the stage run again
+            self._drop(key)
+            return False, None
+        self._index[key]["atime"] = time.time()
+        self._save_index()
+        return True, result
+
+    def put(self, key, result, outputs=()):
+        """Store a stage result and evict old entries if over the size limit"""
+        path = self._path(key)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **_encode(result))
+        os.replace(tmp, path)
+        self._index[key] = {
+            "size": os.path.getsize(path),
+            "atime": time.time(),
+            "outputs": {os.path.abspath(out): self.file_hash(out, fresh=True) for out in outputs},
+        }
+        self._evict()
+        self._save_index()
+
+    def _drop(self, key):
+        self._index.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["atime"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._index[key]["size"]
+            self._drop(key)
+
+    def clear(self):
+        """Remove every cached result"""
+        for key in list(self._index):
+            self._drop(key)
+        self._save_index()
+
+    def code_digest(self, func, depends=()):
+        """Hash of a stage's code, its helper functions and its extra state"""
+        h = hashlib.sha256()
+        _update_code_digest(h, func, set())
+        for state in depends:
+            _update_digest(h, state())
+        return h.hexdigest()
+
+    def stage(self, files=(), outputs=(), depends=()):
+        """
+        Decorator that caches a function's result.
+
+        Parameters:
+            files (tuple): Names of arguments holding input file paths; their
+                contents are hashed into the key.
+            outputs (tuple): Names of arguments holding output file paths; a
+                cached result only counts as a hit if these files still hold
+                what the stage wrote for the same key.
+            depends (tuple): Zero-argument callables returning extra state the
+                result depends on (e.g. lambda: plt.rcParams); evaluated and
+                hashed on every call.
+        """
+        def decorator(func):
+            signature = inspect.signature(func)
+            name = func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                arguments = dict(bound.arguments)
+                # Recomputed per call: helpers may be redefined between calls
+                code = self.code_digest(func, depends)
+                key = self.make_key(name, code, arguments,
+                                    [arguments[arg] for arg in files])
+
+                output_paths = [arguments[arg] for arg in outputs]
+                hit, result = self.get(key, output_paths)
+                if hit:
+                    if self.verbose:
+                        print(f"[cache] {name}: unchanged, skipped")
+                    return result
+
+                if self.verbose:
+                    print(f"[cache] {name}: running")
+                result = func(*args, **kwargs)
+                self.put(key, result, output_paths)
+                return result
+
+            wrapper.cache = self
+            return wrapper
+        return decorator
+
+
+def _encode(result):
+    """Flatten a stage result into named arrays for np.savez"""
+    arrays = {}
+    meta = _encode_value(result, arrays)
+    arrays["__meta__"] = np.array(json.dumps(meta))
+    return arrays
+
+
+def _encode_value(value, arrays):
+    if value is None:
+        return {"kind": "none"}
+    if isinstance(value, (tuple, list)):
+        return {"kind": type(value).__name__, "items": [_encode_value(v, arrays) for v in value]}
+    if isinstance(value, dict):
+        return {"kind": "dict", "items": [[_encode_value(k, arrays), _encode_value(v, arrays)]
+                                          for k, v in value.items()]}
+    name = f"a{len(arrays)}"
+    if isinstance(value, np.ndarray) and value.dtype != object:
+        arrays[name] = value
+        return {"kind": "array", "name": name}
+    if isinstance(value, np.generic) and not isinstance(value, np.object_):
+        arrays[name] = np.asarray(value)
+        return {"kind": "npscalar", "name": name}
+    # DataFrames (labels, dtypes, index and all), Python scalars and anything
+    # else are pickled into a byte array so a hit returns an identical object
+    arrays[name] = np.frombuffer(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+    return {"kind": "pickle", "name": name}
+
+
+def _decode(data):
+    """Rebuild a stage result from a loaded .npz archive"""
+    return _decode_value(json.loads(str(data["__meta__"])), data)
+
+
+def _decode_value(meta, data):
+    kind = meta["kind"]
+    if kind == "none":
+        return None
+    if kind in ("tuple", "list"):
+        items = [_decode_value(item, data) for item in meta["items"]]
+        return tuple(items) if kind == "tuple" else items
+    if kind == "dict":
+        return {_decode_value(k, data): _decode_value(v, data) for k, v in meta["items"]}
+    value = data[meta["name"]]
+    if kind == "npscalar":
+        return value[()]
+    if kind == "pickle":
+        return pickle.loads(value.tobytes())
+    return value
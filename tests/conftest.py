@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The project modules are plain scripts imported by name, not a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "viscosimeter")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
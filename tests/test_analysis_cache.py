@@ -0,0 +1,222 @@
+import os
+
+import numpy as np
+import pytest
+
+import analysis_cache
+from analysis_cache import ResultCache
+
+pd = pytest.importorskip("pandas")
+
+
+class CallLog:
+    """Records stage runs without becoming part of the key (see module docstring)"""
+
+    def __init__(self):
+        self.args = []
+
+    def __call__(self, arg):
+        self.args.append(arg)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"), verbose=False)
+
+
+def _counting(cache, **stage_kwargs):
+    """Stage that records how often its body actually runs"""
+    calls = CallLog()
+
+    @cache.stage(**stage_kwargs)
+    def double(x):
+        calls(x)
+        return np.asarray(x) * 2
+
+    return double, calls
+
+
+def test_hit_skips_stage(cache):
+    double, calls = _counting(cache)
+    first = double(np.arange(5))
+    second = double(np.arange(5))
+    np.testing.assert_array_equal(first, second)
+    assert len(calls.args) == 1
+    double(np.arange(6))
+    assert len(calls.args) == 2
+
+
+def test_hit_survives_new_cache_instance(tmp_path):
+    directory = str(tmp_path / "cache")
+    double, calls = _counting(ResultCache(directory, verbose=False))
+    double(np.arange(3))
+    double_again, calls_again = _counting(ResultCache(directory, verbose=False))
+    np.testing.assert_array_equal(double_again(np.arange(3)), [0, 2, 4])
+    assert calls_again.args == []
+
+
+def test_input_file_change_invalidates(cache, tmp_path):
+    data = tmp_path / "data.txt"
+    data.write_text("1 2 3")
+    calls = CallLog()
+
+    @cache.stage(files=("filename",))
+    def load(filename):
+        calls(filename)
+        return np.loadtxt(filename)
+
+    load(str(data))
+    load(str(data))
+    data.write_text("1 2 3 4")
+    os.utime(data, ns=(0, 10 ** 9))
+    np.testing.assert_array_equal(load(str(data)), [1, 2, 3, 4])
+    assert len(calls.args) == 2
+
+
+def test_helper_change_invalidates(cache):
+    # Simulates redefining a helper in a notebook cell
+    namespace = {"__name__": "notebook", "cache": cache, "np": np}
+    exec("def helper(x):\n    return x * 2\n", namespace)
+    exec("@cache.stage()\ndef stage(x):\n    return helper(np.asarray(x))\n", namespace)
+    assert namespace["stage"]([1, 2]).tolist() == [2, 4]
+    exec("def helper(x):\n    return x * 3\n", namespace)
+    assert namespace["stage"]([1, 2]).tolist() == [3, 6]
+
+
+def test_depends_state_invalidates(cache):
+    settings = {"scale": 2}
+    calls = CallLog()
+
+    @cache.stage(depends=(lambda: settings,))
+    def scaled(x):
+        calls(x)
+        return x * settings["scale"]
+
+    assert scaled(5) == 10
+    assert scaled(5) == 10
+    settings["scale"] = 3
+    assert scaled(5) == 15
+    assert len(calls.args) == 2
+
+
+def test_missing_output_reruns(cache, tmp_path):
+    out = tmp_path / "plot.txt"
+    calls = CallLog()
+
+    @cache.stage(outputs=("path",))
+    def render(x, path):
+        calls(x)
+        with open(path, "w") as f:
+            f.write(str(x))
+
+    render(1, str(out))
+    render(1, str(out))
+    out.unlink()
+    render(1, str(out))
+    assert len(calls.args) == 2 and out.exists()
+
+
+def test_output_rewritten_by_other_key_reruns(cache, tmp_path):
+    out = tmp_path / "plot.txt"
+    calls = CallLog()
+
+    @cache.stage(outputs=("path",))
+    def render(x, path):
+        calls(x)
+        with open(path, "w") as f:
+            f.write(str(x))
+
+    render(1, str(out))
+    render(2, str(out))
+    render(1, str(out))
+    assert out.read_text() == "1"
+    assert calls.args == [1, 2, 1]
+    render(1, str(out))
+    assert calls.args == [1, 2, 1]
+
+
+def test_corrupt_archive_is_a_miss(cache):
+    double, calls = _counting(cache)
+    double(np.arange(3))
+    (key,) = cache._index
+    with open(cache._path(key), "wb") as f:
+        f.write(b"not a zip archive")
+    np.testing.assert_array_equal(double(np.arange(3)), [0, 2, 4])
+    assert len(calls.args) == 2
+
+
+@pytest.mark.parametrize("error", [AttributeError, ModuleNotFoundError, TypeError])
+def test_undecodable_entry_is_a_miss(cache, monkeypatch, error):
+    # What unpickling can raise after a pandas or NumPy upgrade
+    double, calls = _counting(cache)
+    double(np.arange(3))
+
+    def broken(data):
+        raise error("cannot rebuild")
+
+    monkeypatch.setattr(analysis_cache, "_decode", broken)
+    np.testing.assert_array_equal(double(np.arange(3)), [0, 2, 4])
+    assert len(calls.args) == 2
+    assert len(cache._index) == 1
+
+
+def test_attribute_names_are_not_globals(cache):
+    # x.T must not pull in an unrelated global named T
+    namespace = {"__name__": "notebook", "cache": cache, "np": np, "T": np.zeros(3)}
+    exec("@cache.stage()\ndef stage(x):\n    return np.asarray(x).T\n", namespace)
+    digest = cache.code_digest(namespace["stage"])
+    namespace["T"] = np.ones(3)
+    assert cache.code_digest(namespace["stage"]) == digest
+
+
+def test_results_round_trip_exactly(cache):
+    frame = pd.DataFrame({0: [1.5, 2.5, np.nan], "cat": pd.Categorical(["a", "b", "a"])})
+    frame.index = pd.RangeIndex(3, name="sample")
+    duplicated = pd.DataFrame([[1, 2], [3, 4]], columns=["x", "x"])
+    result = {
+        "frame": frame,
+        "duplicated": duplicated,
+        "scalar": np.float32(1.25),
+        "pair": (np.arange(3), 7),
+        1: "int key",
+    }
+
+    @cache.stage()
+    def produce():
+        return result
+
+    miss = produce()
+    hit = produce()
+    pd.testing.assert_frame_equal(hit["frame"], frame)
+    assert isinstance(hit["frame"].index, pd.RangeIndex)
+    assert hit["frame"].index.name == "sample"
+    assert hit["frame"]["cat"].dtype == "category"
+    pd.testing.assert_frame_equal(hit["duplicated"], duplicated)
+    assert type(hit["scalar"]) is np.float32
+    assert isinstance(hit["pair"], tuple) and hit["pair"][1] == 7
+    np.testing.assert_array_equal(hit["pair"][0], np.arange(3))
+    assert hit[1] == "int key"
+    assert miss is result
+
+
+def test_lru_eviction_keeps_size_bound(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=3 * 8000 + 1000, verbose=False)
+    calls = CallLog()
+
+    @cache.stage()
+    def block(i):
+        calls(i)
+        return np.full(1000, i, dtype=np.float64)
+
+    block(0)
+    block(1)
+    block(2)
+    block(0)  # refresh 0 so 1 is now the least recently used
+    block(3)
+    total = sum(os.path.getsize(os.path.join(cache.directory, name))
+                for name in os.listdir(cache.directory) if name.endswith(".npz"))
+    assert total <= cache.max_bytes
+    calls.args.clear()
+    block(0)
+    block(1)
+    assert calls.args == [1]
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+skidl = pytest.importorskip("skidl")
+
+from export import export_circuit
+
+
+def _resistor(circuit, value, footprint="Resistor_SMD:R_0805_2012Metric"):
+    return skidl.Part(tool=skidl.SKIDL, name="R", ref_prefix="R", value=value,
+                      footprint=footprint, circuit=circuit,
+                      pins=[skidl.Pin(num=1, func=skidl.Pin.types.PASSIVE),
+                            skidl.Pin(num=2, func=skidl.Pin.types.PASSIVE)])
+
+
+@pytest.fixture
+def divider(tmp_path, monkeypatch):
+    """Two equal resistors plus a third with a different value"""
+    # SKiDL drops its log and backup library in the working directory
+    monkeypatch.chdir(tmp_path)
+    circuit = skidl.Circuit()
+    r1 = _resistor(circuit, "10k")
+    r2 = _resistor(circuit, "10k")
+    r3 = _resistor(circuit, "4.7k")
+    top = skidl.Net("TOP", circuit=circuit)
+    mid = skidl.Net("MID", circuit=circuit)
+    gnd = skidl.Net("GND", circuit=circuit)
+    top += r1[1]
+    mid += r1[2], r2[1], r3[1]
+    gnd += r2[2], r3[2]
+    return circuit
+
+
+def test_bom_grouped_by_value_and_footprint(divider, tmp_path):
+    outputs, _ = export_circuit(divider, basename=str(tmp_path / "div"), formats=["json", "csv"])
+    rows = json.loads((tmp_path / "div.json").read_text())
+    assert [(row["value"], row["quantity"], row["references"]) for row in rows] == [
+        ("10k", 2, ["R1", "R2"]),
+        ("4.7k", 1, ["R3"]),
+    ]
+    lines = (tmp_path / "div.csv").read_text().splitlines()
+    assert lines[0] == "References,Quantity,Value,Footprint,Part"
+    assert lines[1].startswith("R1 R2,2,10k,")
+    assert set(outputs) == {"json", "csv"}
+
+
+def test_report_lists_real_nets(divider, tmp_path):
+    _, report = export_circuit(divider, basename=str(tmp_path / "div"), formats=["report"])
+    assert "  MID: R1.2, R2.1, R3.1\n" in report
+    assert "  GND: R2.2, R3.2\n" in report
+    assert report == (tmp_path / "div.txt").read_text()
+
+
+def test_netlist_written_by_skidl(divider, tmp_path):
+    outputs, _ = export_circuit(divider, basename=str(tmp_path / "div"), formats=["net"])
+    netlist = (tmp_path / "div.net").read_text()
+    assert outputs == {"net": str(tmp_path / "div.net")}
+    assert "(sheetpath" in netlist and "(pintype" in netlist
+
+
+def test_unknown_format_rejected(divider, tmp_path):
+    with pytest.raises(ValueError):
+        export_circuit(divider, basename=str(tmp_path / "div"), formats=["pdf"])
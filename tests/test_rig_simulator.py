@@ -0,0 +1,123 @@
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from rig_simulator import FIT_KT, FIT_T0, SAMPLE_DTYPE, RigSimulator, run
+
+
+def test_defaults_come_from_notebook_fit():
+    sim = RigSimulator()
+    assert sim.kt == pytest.approx(FIT_KT * 1e-3)
+    assert sim.t0 == pytest.approx(FIT_T0 * 1e-3)
+
+
+def test_operating_point_balances_voltage_and_torque():
+    sim = RigSimulator()
+    viscosity = np.array([0.1, 1.0, 10.0, 100.0])
+    current, speed = sim.operating_point(viscosity)
+    # Electrical and mechanical equations both hold
+    np.testing.assert_allclose(sim.resistance * current + sim.kt * speed, sim.supply_voltage)
+    np.testing.assert_allclose(sim.kt * current + sim.t0, sim.geometry * viscosity * speed)
+    # Thicker fluid: more current, lower speed
+    assert np.all(np.diff(current) > 0)
+    assert np.all(np.diff(speed) < 0)
+
+
+def test_operating_point_clips_negative_current():
+    # Below this load the fit's intercept alone exceeds the viscous torque
+    current, speed = RigSimulator().operating_point(np.array([1e-6]))
+    assert current[0] == 0.0
+    assert speed[0] > 0.0
+
+
+def test_chunks_continue_phase_and_time():
+    kwargs = dict(sample_rate=20000, viscosity=0.5, viscosity_end=2.0, ramp_duration=1.0,
+                  noise_v=0.0, switch_presses=[(0.3, 0.6)], seed=0)
+    whole = RigSimulator(**kwargs).generate(20000)
+    sim = RigSimulator(**kwargs)
+    pieces = np.concatenate([sim.generate(n) for n in (1234, 7000, 11766)])
+    assert pieces.dtype == SAMPLE_DTYPE
+    np.testing.assert_array_equal(pieces["d2"], whole["d2"])
+    np.testing.assert_array_equal(pieces["d7"], whole["d7"])
+    np.testing.assert_array_equal(pieces["a0"], whole["a0"])
+    assert sim.sample_index == 20000
+
+
+def test_pulses_track_shaft_speed():
+    sim = RigSimulator(sample_rate=100000, pulses_per_rev=2, seed=0)
+    data = sim.generate(100000)
+    _, speed = sim.operating_point(np.array([sim.viscosity]))
+    rising = np.count_nonzero(np.diff(data["d2"].astype(int)) == 1)
+    assert rising == pytest.approx(2 * speed[0] / (2 * np.pi), abs=2)
+
+
+def test_switch_is_active_low():
+    sim = RigSimulator(sample_rate=1000, switch_presses=[(0.2, 0.3)], seed=0)
+    d7 = sim.generate(1000)["d7"]
+    assert d7[:200].all() and not d7[200:300].any() and d7[300:].all()
+
+
+def test_csv_and_bin_agree():
+    bin_buf, csv_buf = io.BytesIO(), io.BytesIO()
+    run(RigSimulator(sample_rate=1000, seed=3), 0.5, bin_buf, "bin", chunk_size=128)
+    run(RigSimulator(sample_rate=1000, seed=3), 0.5, csv_buf, "csv", chunk_size=128)
+    records = np.frombuffer(bin_buf.getvalue(), dtype=SAMPLE_DTYPE)
+    lines = csv_buf.getvalue().decode().splitlines()
+    assert lines[0] == "t,a0,a1,d2,d7"
+    table = np.array([line.split(",") for line in lines[1:]], dtype=float)
+    assert len(records) == len(table) == 500
+    np.testing.assert_allclose(table[:, 0], np.arange(500) / 1000)
+    for i, name in enumerate(SAMPLE_DTYPE.names, 1):
+        np.testing.assert_array_equal(table[:, i], records[name])
+
+
+def test_csv_uses_small_default_chunks(monkeypatch):
+    import rig_simulator
+
+    sizes = []
+    monkeypatch.setattr(rig_simulator, "write_chunk", lambda f, chunk, *args: sizes.append(len(chunk)))
+    run(RigSimulator(sample_rate=1e6, seed=0), 0.2, io.BytesIO(), "csv")
+    assert max(sizes) == rig_simulator.DEFAULT_CHUNK["csv"]
+    assert sum(sizes) == 200000
+
+
+def test_imports_without_unix_terminal_modules(monkeypatch):
+    import importlib
+
+    import rig_simulator
+
+    for name in ("fcntl", "termios", "tty"):
+        monkeypatch.setitem(sys.modules, name, None)
+    module = importlib.reload(rig_simulator)
+    assert module.RigSimulator(sample_rate=100).generate(10).shape == (10,)
+
+
+def test_pty_rejected_without_openpty(monkeypatch, capsys):
+    import rig_simulator
+
+    monkeypatch.delattr(rig_simulator.os, "openpty", raising=False)
+    with pytest.raises(SystemExit) as exc:
+        rig_simulator.main(["--pty", "--duration", "0.01"])
+    assert exc.value.code == 2
+    assert "--pty" in capsys.readouterr().err
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs Unix pseudo-terminals")
+def test_wait_for_reader_gives_up_without_reader():
+    import tty
+
+    from rig_simulator import wait_for_reader
+
+    master, slave = os.openpty()
+    try:
+        tty.setraw(slave)
+        os.write(master, b"x" * 100)
+        assert wait_for_reader(slave, timeout=0.2) == 100
+        os.read(slave, 100)
+        assert wait_for_reader(slave, timeout=0.2) == 0
+    finally:
+        os.close(master)
+        os.close(slave)
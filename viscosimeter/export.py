@@ -0,0 +1,146 @@
+"""
+Export engine for the viscosimeter circuit.
+
+Emits from one SKiDL circuit:
+  * a KiCad netlist (.net), written by SKiDL's own generator
+  * a BOM grouped by value and footprint (.csv and .json)
+  * a connection report built from the real nets (.txt)
+
+The BOM and the report are filled from a single pass over parts and nets,
+however many of those formats are requested.
+"""
+import csv
+import io
+import json
+import os
+import re
+
+import skidl
+
+# Output formats understood by export_circuit() and their file extensions
+EXPORT_FORMATS = {
+    "net": ".net",
+    "csv": ".csv",
+    "json": ".json",
+    "report": ".txt",
+}
+
+
+def _natural_key(ref):
+    """Sort key so that R2 comes before R10"""
+    return [int(tok) if tok.isdigit() else tok for tok in re.split(r"(\d+)", ref)]
+
+
+def _pin_label(pin):
+    """Readable pin name, falling back to the pin number for unnamed pins"""
+    name = getattr(pin, "name", "")
+    if not name or name == "~":
+        return str(pin.num)
+    return name
+
+
+def _lib_name(part):
+    """Name of the library a part was instantiated from"""
+    lib = getattr(part, "lib", None)
+    if lib is None:
+        return ""
+    if isinstance(lib, str):
+        return lib
+    filename = getattr(lib, "filename", "") or ""
+    # SchLib.filename may be a full path to the .kicad_sym file
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def export_circuit(circuit=None, basename="viscosimeter", formats=None):
+    """
+    Export a circuit's netlist, BOM and connection report.
+
+    Parameters:
+        circuit: SKiDL circuit to export (defaults to skidl's default_circuit).
+        basename (str): Path prefix for the output files.
+        formats (iterable): Subset of EXPORT_FORMATS keys to write (default: all).
+
+    Returns:
+        tuple: (dict mapping format name to the file written, connection report text)
+    """
+    if circuit is None:
+        circuit = skidl.default_circuit
+    formats = list(EXPORT_FORMATS) if formats is None else list(formats)
+    unknown = [fmt for fmt in formats if fmt not in EXPORT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown export format(s): {', '.join(unknown)}")
+
+    outputs = {}
+    if "net" in formats:
+        # SKiDL's generator merges net names, reports ERC-style warnings,
+        # refreshes the backup part library and writes the KiCad tstamps,
+        # sheetpaths and pin types that Pcbnew needs
+        outputs["net"] = basename + EXPORT_FORMATS["net"]
+        circuit.generate_netlist(file_=outputs["net"])
+    else:
+        circuit.merge_net_names()
+
+    # Buffered writers, flushed to disk once the traversal is done
+    report_buf = io.StringIO()
+    bom_groups = {}
+
+    # Single pass over the parts: BOM grouping
+    for part in circuit.parts:
+        value = getattr(part, "value", "") or part.name
+        footprint = getattr(part, "footprint", "") or ""
+        lib = _lib_name(part)
+        group = bom_groups.setdefault((value, footprint), {
+            "value": value,
+            "footprint": footprint,
+            "part": f"{lib}:{part.name}" if lib else part.name,
+            "refs": [],
+        })
+        group["refs"].append(part.ref)
+
+    # Single pass over the nets: connection report
+    report_buf.write("Viscosimeter Circuit Connections:\n")
+    report_buf.write("================================\n")
+    for net in sorted(circuit.get_nets(), key=lambda n: n.name):
+        pins = sorted(net.get_pins(), key=lambda p: (_natural_key(p.part.ref), _natural_key(str(p.num))))
+        if not pins:
+            continue
+        nodes = [f"{pin.part.ref}.{_pin_label(pin)}" for pin in pins]
+        report_buf.write(f"  {net.name}: {', '.join(nodes)}\n")
+
+    # BOM rows, one per (value, footprint) group
+    bom_rows = []
+    for group in sorted(bom_groups.values(), key=lambda g: _natural_key(min(g["refs"], key=_natural_key))):
+        refs = sorted(group["refs"], key=_natural_key)
+        bom_rows.append({
+            "references": refs,
+            "quantity": len(refs),
+            "value": group["value"],
+            "footprint": group["footprint"],
+            "part": group["part"],
+        })
+
+    report_buf.write("\nBill of Materials:\n")
+    for row in bom_rows:
+        report_buf.write(f"  {row['quantity']} x {row['value']} ({row['footprint']}): {', '.join(row['references'])}\n")
+
+    for fmt in formats:
+        if fmt == "net":
+            continue
+        filename = basename + EXPORT_FORMATS[fmt]
+        if fmt == "report":
+            content = report_buf.getvalue()
+        elif fmt == "json":
+            content = json.dumps(bom_rows, indent=2) + "\n"
+        else:
+            csv_buf = io.StringIO()
+            writer = csv.writer(csv_buf)
+            writer.writerow(["References", "Quantity", "Value", "Footprint", "Part"])
+            for row in bom_rows:
+                writer.writerow([" ".join(row["references"]), row["quantity"],
+                                 row["value"], row["footprint"], row["part"]])
+            content = csv_buf.getvalue()
+        with open(filename, "w", newline="", encoding="utf-8") as f:
+            f.write(content)
+        outputs[fmt] = filename
+
+    return outputs, report_buf.getvalue()
@@ -0,0 +1,292 @@
+"""
+Rig simulator for the viscosimeter.
+
+Produces synthetic telemetry for the channels defined in viscosimeter.py:
+  * A0 - ACS712-30A output (motor current)
+  * A1 - 48.7k/31.4k divider on the +12V rail
+  * D2 - proximity sensor pulses (shaft rotation)
+  * D7 - push-button switch (pull-up, active low)
+
+The RS-445PA motor drives a cylindrical spindle in a fluid of configurable
+viscosity. The motor torque follows the notebook's linear fit T = m*I + b
+(mN*m, A), and the operating point is solved in closed form for every sample,
+so whole chunks are generated with NumPy array operations.
+
+Running the script:
+    python rig_simulator.py --duration 3600 --rate 100000 --output rig.bin
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+# Record layout for the binary output format
+SAMPLE_DTYPE = np.dtype([
+    ("a0", "<u2"),
+    ("a1", "<u2"),
+    ("d2", "u1"),
+    ("d7", "u1"),
+])
+
+# Recorded output of the linear T-vs-I fit in electronica.ipynb
+# ("K_t: [52.10700796  0.1127697 ]"): slope m in mN*m/A, intercept b in mN*m
+FIT_KT = 52.10700796
+FIT_T0 = 0.1127697
+
+# One CSV line: t, a0, a1, d2, d7
+CSV_ROW = "%.7f,%d,%d,%d,%d\n"
+
+# Samples per chunk; CSV chunks are formatted through Python objects, so
+# they are kept small to bound memory
+DEFAULT_CHUNK = {"bin": 1 << 20, "csv": 1 << 16}
+
+# Divider ratio seen by A1 (R2 / (R1 + R2))
+DIVIDER_RATIO = 31.4e3 / (48.7e3 + 31.4e3)
+
+# ACS712-30A transfer function
+ACS712_OFFSET = 2.5       # V at 0 A
+ACS712_SENSITIVITY = 0.066  # V/A
+
+
+class RigSimulator:
+    """Vectorized model of the motor, fluid and Arduino ADC"""
+
+    def __init__(self, sample_rate=10000.0, viscosity=1.0, viscosity_end=None,
+                 ramp_duration=None, kt=FIT_KT, t0=FIT_T0, supply_voltage=12.0,
+                 winding_resistance=1.45, source_resistance=0.05,
+                 spindle_radius=0.01, spindle_length=0.05, pulses_per_rev=1,
+                 pulse_duty=0.5, ripple=0.05, commutations_per_rev=6,
+                 adc_bits=10, adc_vref=5.0, noise_v=0.005, switch_presses=(),
+                 seed=None):
+        """
+        Parameters:
+            sample_rate (float): Samples per second, per channel.
+            viscosity (float): Fluid dynamic viscosity in Pa*s.
+            viscosity_end (float): If given, viscosity ramps linearly to this value.
+            ramp_duration (float): Seconds taken by the viscosity ramp.
+            kt (float): Slope m of the notebook's T-vs-I fit, in mN*m/A.
+            t0 (float): Intercept b of the notebook's T-vs-I fit, in mN*m.
+            supply_voltage (float): Open-circuit voltage of the 12V supply.
+            winding_resistance (float): Motor armature resistance in ohms.
+            source_resistance (float): Supply + wiring resistance in ohms.
+            spindle_radius (float): Spindle radius in m.
+            spindle_length (float): Immersed spindle length in m.
+            pulses_per_rev (int): Proximity sensor pulses per shaft revolution.
+            pulse_duty (float): Fraction of each pulse period D2 reads high.
+            ripple (float): Relative commutation ripple on the motor current.
+            commutations_per_rev (int): Commutation events per revolution.
+            adc_bits (int): Arduino ADC resolution.
+            adc_vref (float): ADC reference voltage.
+            noise_v (float): RMS noise added to the analog channels, in volts.
+            switch_presses (iterable): (start, end) times in s where D7 is pressed.
+            seed (int): Seed for the noise generator.
+        """
+        if sample_rate <= 0:
+            raise ValueError("sample_rate must be positive")
+        if viscosity_end is not None and not ramp_duration:
+            raise ValueError("ramp_duration is required when viscosity_end is set")
+
+        self.sample_rate = float(sample_rate)
+        self.viscosity = float(viscosity)
+        self.viscosity_end = viscosity_end
+        self.ramp_duration = ramp_duration
+        # Fit is in mN*m; the model works in SI (Kt in N*m/A equals Ke in V*s/rad)
+        self.kt = kt * 1e-3
+        self.t0 = t0 * 1e-3
+        self.supply_voltage = supply_voltage
+        self.resistance = winding_resistance + source_resistance
+        self.source_resistance = source_resistance
+        # Viscous torque of a cylinder rotating in an unbounded fluid: 4*pi*mu*r^2*L*w
+        self.geometry = 4 * np.pi * spindle_radius ** 2 * spindle_length
+        self.pulses_per_rev = pulses_per_rev
+        self.pulse_duty = pulse_duty
+        self.ripple = ripple
+        self.commutations_per_rev = commutations_per_rev
+        self.adc_max = 2 ** adc_bits - 1
+        self.adc_scale = self.adc_max / adc_vref
+        self.noise_v = noise_v
+        self.switch_presses = np.asarray(list(switch_presses), dtype=float).reshape(-1, 2)
+        self.rng = np.random.default_rng(seed)
+
+        # Streaming state carried between chunks
+        self.sample_index = 0
+        self.phase = 0.0
+
+    def viscosity_at(self, t):
+        """Viscosity in Pa*s at times t (s)"""
+        if self.viscosity_end is None:
+            return np.full_like(t, self.viscosity)
+        frac = np.clip(t / self.ramp_duration, 0.0, 1.0)
+        return self.viscosity + (self.viscosity_end - self.viscosity) * frac
+
+    def operating_point(self, viscosity):
+        """
+        Steady-state motor current (A) and shaft speed (rad/s) for the given viscosity.
+
+        Solves V = R*I + Kt*w together with Kt*I + b = c*mu*w.
+        """
+        load = self.geometry * viscosity
+        current = (load * self.supply_voltage / self.kt - self.t0) / (self.kt + load * self.resistance / self.kt)
+        current = np.maximum(current, 0.0)
+        speed = np.maximum((self.supply_voltage - self.resistance * current) / self.kt, 0.0)
+        return current, speed
+
+    def _quantize(self, volts):
+        """Convert volts to ADC counts with noise"""
+        volts = volts + self.noise_v * self.rng.standard_normal(volts.shape, dtype=np.float32)
+        return np.clip(np.rint(volts * self.adc_scale), 0, self.adc_max).astype(np.uint16)
+
+    def generate(self, n):
+        """Generate the next n samples as a SAMPLE_DTYPE array"""
+        t = (self.sample_index + np.arange(n)) / self.sample_rate
+        current, speed = self.operating_point(self.viscosity_at(t))
+
+        # Shaft angle, continued from the previous chunk
+        phase = self.phase + np.cumsum(speed) / self.sample_rate
+        # Wrap to one revolution so precision holds over hours of data
+        self.phase = float(phase[-1] % (2 * np.pi)) if n else self.phase
+        self.sample_index += n
+
+        current = current * (1.0 + self.ripple * np.sin(self.commutations_per_rev * phase))
+        rail = self.supply_voltage - self.source_resistance * current
+
+        out = np.empty(n, dtype=SAMPLE_DTYPE)
+        out["a0"] = self._quantize(ACS712_OFFSET + ACS712_SENSITIVITY * current)
+        out["a1"] = self._quantize(rail * DIVIDER_RATIO)
+        pulse_pos = (phase * self.pulses_per_rev / (2 * np.pi)) % 1.0
+        out["d2"] = pulse_pos < self.pulse_duty
+        pressed = np.zeros(n, dtype=bool)
+        for start, end in self.switch_presses:
+            pressed |= (t >= start) & (t < end)
+        out["d7"] = ~pressed
+        return out
+
+    def stream(self, duration, chunk_size=1 << 20):
+        """Yield chunks of samples until duration seconds have been generated"""
+        total = int(round(duration * self.sample_rate))
+        while self.sample_index < total:
+            yield self.generate(min(chunk_size, total - self.sample_index))
+
+
+def write_chunk(f, chunk, fmt, sample_rate, start_index):
+    """Write one chunk to an open binary file in the given format"""
+    if fmt == "bin":
+        f.write(chunk.tobytes())
+        return
+    n = len(chunk)
+    # Interleave the columns and format the whole chunk with one % operation
+    rows = np.empty((n, 5), dtype=object)
+    rows[:, 0] = ((start_index + np.arange(n)) / sample_rate).tolist()
+    for i, name in enumerate(SAMPLE_DTYPE.names, 1):
+        rows[:, i] = chunk[name].tolist()
+    f.write((CSV_ROW * n % tuple(rows.ravel().tolist())).encode("ascii"))
+
+
+def run(sim, duration, f, fmt="bin", chunk_size=None):
+    """Stream the simulation to an open binary file; returns the samples written"""
+    chunk_size = chunk_size or DEFAULT_CHUNK[fmt]
+    written = 0
+    if fmt == "csv":
+        f.write(("t," + ",".join(SAMPLE_DTYPE.names) + "\n").encode("ascii"))
+    for chunk in sim.stream(duration, chunk_size):
+        write_chunk(f, chunk, fmt, sim.sample_rate, sim.sample_index - len(chunk))
+        written += len(chunk)
+    f.flush()
+    return written
+
+
+def wait_for_reader(fd, timeout=10.0, poll=0.05):
+    """
+    Wait until a reader has consumed everything queued on a pty slave.
+
+    Gives up once the queue has not shrunk for timeout seconds (no reader, or
+    the reader went away) and returns the number of bytes left unread.
+    """
+    import fcntl
+    import termios
+
+    last, stalled_since = None, time.monotonic()
+    while True:
+        queued = struct.unpack("i", fcntl.ioctl(fd, termios.FIONREAD, b"\0" * 4))[0]
+        if not queued:
+            return 0
+        if queued != last:
+            last, stalled_since = queued, time.monotonic()
+        elif time.monotonic() - stalled_since > timeout:
+            return queued
+        time.sleep(poll)
+
+
+def stream_to_pty(sim, duration, fmt, chunk_size=None, drain_timeout=10.0):
+    """Stream the simulation into a new pseudo-terminal (Unix only)"""
+    import tty
+
+    # Readers open the slave side like a serial port; we write into the master.
+    # Raw mode stops the line discipline from buffering lines, echoing data
+    # back and rewriting control bytes in the binary stream.
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    output = os.ttyname(slave)
+    print(f"Streaming to pty: {output}")
+    sys.stdout.flush()
+    with os.fdopen(master, "wb") as f:
+        written = run(sim, duration, f, fmt, chunk_size)
+        # Closing the master hangs up the reader, so let it drain the queue first
+        unread = wait_for_reader(slave, drain_timeout)
+    os.close(slave)
+    if unread:
+        print(f"Warning: reader stalled, {unread} bytes left unread on {output}")
+    return output, written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic viscosimeter rig telemetry")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of data to generate")
+    parser.add_argument("--rate", type=float, default=10000.0, help="sample rate in Hz (up to MHz)")
+    parser.add_argument("--viscosity", type=float, default=1.0, help="fluid viscosity in Pa*s")
+    parser.add_argument("--viscosity-end", type=float, default=None, help="ramp viscosity to this value")
+    parser.add_argument("--kt", type=float, default=FIT_KT,
+                        help="K_t slope from the notebook's T-vs-I fit, mN*m/A")
+    parser.add_argument("--t0", type=float, default=FIT_T0,
+                        help="intercept from the notebook's T-vs-I fit, mN*m")
+    parser.add_argument("--noise", type=float, default=0.005, help="analog RMS noise in volts")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--format", choices=("bin", "csv"), default="bin",
+                        help="bin: packed records, several M samples/s; "
+                             "csv: text, roughly 1M samples/s, for low rates and debugging")
+    parser.add_argument("--chunk", type=int, default=None,
+                        help=f"samples per chunk (default {DEFAULT_CHUNK['bin']} for bin, "
+                             f"{DEFAULT_CHUNK['csv']} for csv)")
+    parser.add_argument("--output", default="rig.bin", help="output file or device path")
+    parser.add_argument("--pty", action="store_true",
+                        help="stream to a new pseudo-terminal instead of a file (Unix only); "
+                             "writing blocks until a reader opens the pty and keeps up")
+    parser.add_argument("--drain-timeout", type=float, default=10.0,
+                        help="with --pty, seconds to wait for a stalled reader before closing")
+    args = parser.parse_args(argv)
+    if args.pty and not hasattr(os, "openpty"):
+        parser.error("--pty needs Unix pseudo-terminals, which this platform does not provide")
+
+    sim = RigSimulator(sample_rate=args.rate, viscosity=args.viscosity,
+                       viscosity_end=args.viscosity_end,
+                       ramp_duration=args.duration if args.viscosity_end is not None else None,
+                       kt=args.kt, t0=args.t0, noise_v=args.noise, seed=args.seed)
+
+    if args.pty:
+        output, written = stream_to_pty(sim, args.duration, args.format, args.chunk,
+                                        args.drain_timeout)
+    else:
+        output = args.output
+        with open(output, "wb") as f:
+            written = run(sim, args.duration, f, args.format, args.chunk)
+
+    current, speed = sim.operating_point(sim.viscosity_at(np.array([0.0])))
+    print(f"Samples written: {written} -> {output}")
+    print(f"  Initial operating point: I = {current[0]:.3f} A, {speed[0] * 60 / (2 * np.pi):.0f} rpm")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ import kicad_init
 
 # Now import SKiDL and other modules
 from skidl import *
+from export import export_circuit
 import os
 import json
 import uuid
@@ -577,35 +578,15 @@ def create_viscosimeter_circuit():
     # Optional: Connect 12V to Arduino VIN (dashed line in diagram)
     arduino["VIN"] += vcc12
     
-    # Generate netlist
-    netlist_file = "viscosimeter.net"
-    generate_netlist()
+    # Export netlist, BOM and connection report in a single pass over the circuit
+    outputs, report = export_circuit(basename="viscosimeter")
+    netlist_file = outputs["net"]
     print(f"Netlist generated successfully: {netlist_file}")
-    
-    
-    # Generate a simple schematic text description
-    print("\nViscosimeter Circuit Connections:")
-    print("================================")
-    print("Power Supply:")
-    print(f"  12V Supply -> Current Sensor IP+")
-    print(f"  12V Supply -> Voltage Divider R1 (top)")
-    print(f"  12V Supply -> Arduino VIN (optional)")
-    print(f"  5V from Arduino -> Current Sensor VCC, Proximity Sensor VCC")
-    print(f"  GND common to all components")
-    
-    print("\nSignal Connections:")
-    print(f"  Current Sensor VIOUT -> Arduino A0")
-    print(f"  Voltage Divider (R1/R2 junction) -> Arduino A1")
-    print(f"  Proximity Sensor OUT -> Arduino D2")
-    print(f"  Switch -> Arduino D7")
-    print(f"  Current Sensor IP- -> Motor (+)")
-    print(f"  Motor (-) -> GND")
-    
-    print("\nComponent Details:")
-    print(f"  Current Sensor: ACS712xLCTR-30A (±30A, 66mV/A)")
-    print(f"  Motor: RS-445PA-14233R")
-    print(f"  Proximity Sensor: TCD210245AA (3-pin: VCC, GND, OUT)")
-    print(f"  Voltage Divider: 48.7kΩ / 31.4kΩ (for 12V monitoring)")
+    print(f"BOM generated: {outputs['csv']}, {outputs['json']}")
+    print(f"Connection report generated: {outputs['report']}")
+
+    print()
+    print(report)
 
     # Generate KiCad schematic file with proper S-expression format
     schematic_file = "viscosimeter.kicad_sch"